@@ -0,0 +1,133 @@
+"""Two-level cache for scoring results: in-process L1, optional Redis L2."""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+import orjson
+from cachetools import TTLCache
+
+try:
+    from redis.asyncio import Redis
+except ImportError:  # redis is optional; without it the cache is memory-only
+    Redis = None
+
+logger = logging.getLogger(__name__)
+
+# Namespace for scoring results in a shared Redis
+REDIS_KEY_PREFIX = "score:"
+
+
+class ScoreCache:
+    """TTL-bounded LRU cache of scoring results keyed by message hash.
+
+    Concurrent misses for the same key are coalesced (single-flight): the
+    first request scores the message and the others await its result. If that
+    request is cancelled (e.g. its client disconnected), the others retry.
+
+    When connected to Redis, results are also shared across worker processes:
+    L1 misses are looked up in Redis before scoring, and new results are
+    written to both levels. Redis failures are logged and treated as misses.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: int = 3600):
+        """Initialize an empty, memory-only cache."""
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._ttl = ttl
+        self._redis = None
+
+    async def connect(self, redis_url: str) -> bool:
+        """Attach a Redis L2 cache.
+
+        Returns:
+            True if Redis is reachable, False if the cache stays memory-only
+        """
+        if Redis is None:
+            logger.warning("REDIS_URL is set but redis is not installed; using memory-only cache")
+            return False
+        client = Redis.from_url(redis_url)
+        try:
+            await client.ping()
+        except Exception as e:
+            logger.warning(f"Redis unavailable, using memory-only cache: {e}")
+            await client.aclose()
+            return False
+        self._redis = client
+        return True
+
+    @property
+    def redis(self):
+        """The connected Redis client, or None when memory-only."""
+        return self._redis
+
+    async def close(self) -> None:
+        """Close the Redis connection, if any."""
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def _redis_get(self, key: str) -> dict | None:
+        """Look up key in Redis, or None on a miss or error."""
+        try:
+            value = await self._redis.get(REDIS_KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Redis get failed: {e}")
+            return None
+        return orjson.loads(value) if value is not None else None
+
+    async def _redis_set(self, key: str, result: dict) -> None:
+        """Store result in Redis with the cache TTL, ignoring errors."""
+        try:
+            await self._redis.setex(REDIS_KEY_PREFIX + key, self._ttl, orjson.dumps(result))
+        except Exception as e:
+            logger.warning(f"Redis set failed: {e}")
+
+    async def get_or_score(
+        self, key: str, score: Callable[[], Awaitable[dict]]
+    ) -> tuple[dict, bool]:
+        """
+        Return the cached result for key, calling score() on a miss.
+
+        Returns:
+            Tuple of (result, cache_hit)
+        """
+        while True:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached, True
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            try:
+                return await asyncio.shield(pending), True
+            except asyncio.CancelledError:
+                # Re-raise if this request was cancelled; if only the request
+                # scoring the message went away, look the key up again
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._redis_get(key) if self._redis is not None else None
+            hit = result is not None
+            if not hit:
+                result = await score()
+                if self._redis is not None:
+                    await self._redis_set(key, result)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure with no waiters is not reported as unhandled
+            future.exception()
+            raise
+        else:
+            self._cache[key] = result
+            future.set_result(result)
+            return result, hit
+        finally:
+            del self._inflight[key]
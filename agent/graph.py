@@ -1,36 +1,234 @@
 """LangGraph agent for emotional scoring."""
 
-import json
+import logging
+import re
 import time
-from typing import Annotated, TypedDict
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from functools import cache, lru_cache
 
+import orjson
+import tiktoken
 from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import StateGraph, END
-from langgraph.graph.message import add_messages
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    stop_after_delay,
+    wait_exponential_jitter,
+)
 
+from agent.prefilter import is_out_of_domain
 from agent.prompts import (
-    ACTION_ROUTING_PROMPT,
-    DOMAIN_VALIDATION_PROMPT,
-    EMOTIONAL_SCORING_PROMPT,
+    SCORING_SYSTEM_PROMPT,
+    SCORING_USER_PREFIX,
+    SCORING_USER_SUFFIX,
 )
-from models.bedrock import HolisticAIBedrockChat
+from models.bedrock import BedrockTransientError, HolisticAIBedrockChat
 from models.schemas import ActionType
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class AgentState:
+    """State for the scoring agent.
+
+    Nodes read attributes and return dicts holding only the fields they update.
+    """
+
+    message: str = ""
+    domain_match: bool = False
+    domain_reasoning: str = ""
+    score: int = 0
+    confidence: float = 0.0
+    reasoning: str = ""
+    key_indicators: list[str] = field(default_factory=list)
+    recommended_action: str = ActionType.LOG_ONLY.value
+    action_rationale: str = ""
+    tokens_used: int = 0
+    start_time: int = 0
+
+
+# Outermost {...} block, so prose or markdown code fences around the JSON are ignored
+_JSON_RE = re.compile(rb"\{.*\}", re.DOTALL)
+
+
+def _parse_json(text: str) -> dict | None:
+    """Extract and parse the JSON object in an LLM response, or None if there is none."""
+    match = _JSON_RE.search(text.encode())
+    if match is None:
+        return None
+    try:
+        parsed = orjson.loads(match.group(0))
+    except orjson.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+# Static scoring rules, shared by every request
+_SYSTEM_MESSAGE = SystemMessage(content=SCORING_SYSTEM_PROMPT)
+
+OUT_OF_DOMAIN_REASONING = "Message is not related to fertility or emotional support"
+
+
+# Score -> (action, rationale) for scores 0..10; rule-based, no LLM needed.
+# Actions are stored as plain strings so responses need no enum conversion.
+_ACTION_TABLE: tuple[tuple[str, str], ...] = (
+    ((ActionType.OUT_OF_DOMAIN.value, "Message is out of domain"),)
+    + tuple(
+        (ActionType.LOG_ONLY.value, f"Score {s} indicates low concern - monitoring only")
+        for s in range(1, 6)
+    )
+    + tuple(
+        (ActionType.NOTIFY_CARETAKER.value, f"Score {s} indicates moderate concern - caretaker notification")
+        for s in range(6, 8)
+    )
+    + tuple(
+        (ActionType.BOOK_GP_APPOINTMENT.value, f"Score {s} indicates high distress - GP appointment needed")
+        for s in range(8, 10)
+    )
+    + (
+        (
+            ActionType.EMERGENCY_ALERT.value,
+            "Score 10 indicates crisis - immediate emergency intervention required",
+        ),
+    )
+)
+
+_OUT_OF_DOMAIN_ACTION = (ActionType.OUT_OF_DOMAIN.value, OUT_OF_DOMAIN_REASONING)
+
+# Action for a score that is missing or not a number
+_FALLBACK_ACTION = (ActionType.LOG_ONLY.value, "Score unavailable - monitoring only")
+
+
+def _coerce_score(score) -> int | None:
+    """Round a numeric score (the LLM may return 8.0) to an int, or None if not a number."""
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or score != score:
+        return None
+    return int(round(score))
+
+
+def route_score(score: int | float | None) -> tuple[str, str]:
+    """Map a distress score to its recommended action and rationale."""
+    score = _coerce_score(score)
+    if score is None:
+        return _FALLBACK_ACTION
+    if score == -1:
+        return _OUT_OF_DOMAIN_ACTION
+    return _ACTION_TABLE[min(max(score, 0), 10)]
+
+
+def _out_of_domain_update(reasoning: str, confidence: float = 1.0, **extra) -> dict:
+    """State update for a message judged out of domain."""
+    return {
+        "domain_match": False,
+        "domain_reasoning": reasoning,
+        "reasoning": reasoning,
+        "score": -1,
+        "confidence": confidence,
+        "key_indicators": [],
+        **extra,
+    }
+
+
+def interpret_response(response_text: str, parsed: dict | None = None) -> dict:
+    """Turn a scoring LLM response into state fields.
+
+    Args:
+        response_text: Raw LLM response
+        parsed: Already-parsed JSON object, if available
+
+    Returns:
+        Dict with domain_match, domain_reasoning, reasoning, score, confidence
+        and key_indicators
+    """
+    if parsed is None:
+        parsed = _parse_json(response_text)
+
+    if parsed is None:
+        # Fallback if JSON parsing fails: treat as out of domain
+        return _out_of_domain_update(
+            f"Failed to parse scoring response: {response_text[:100]}", confidence=0.3
+        )
+
+    if not parsed.get("domain_match", False):
+        return _out_of_domain_update(
+            parsed.get("reasoning", ""), confidence=parsed.get("confidence", 1.0)
+        )
+
+    return {
+        "domain_match": True,
+        "domain_reasoning": parsed.get("reasoning", ""),
+        "reasoning": parsed.get("reasoning", ""),
+        "score": _coerce_score(parsed.get("score")) or 5,
+        "confidence": parsed.get("confidence", 0.5),
+        "key_indicators": parsed.get("key_indicators", []),
+    }
+
 
-class AgentState(TypedDict):
-    """State for the scoring agent."""
+class _Accumulator:
+    """Collect streamed chunks in a list and join them once at the end.
 
-    message: str
-    domain_match: bool
-    domain_reasoning: str
-    score: int
-    confidence: float
-    reasoning: str
-    key_indicators: list[str]
-    recommended_action: ActionType
-    action_rationale: str
-    tokens_used: int
-    start_time: float
+    Repeated ``buf += chunk`` is quadratic in the response length; appending to
+    a list and joining once keeps accumulation linear.
+    """
+
+    __slots__ = ("_chunks",)
+
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+
+    def append(self, piece: str) -> None:
+        """Add a chunk."""
+        self._chunks.append(piece)
+
+    def text(self) -> str:
+        """Return everything received so far."""
+        return "".join(self._chunks)
+
+
+# BPE encoding used for token accounting, set by load_encoding at startup
+_ENCODING: tiktoken.Encoding | None = None
+
+
+def load_encoding() -> bool:
+    """Load the token-accounting encoding; tiktoken may download it on first use.
+
+    Blocking, so call it off the event loop. On failure count_tokens keeps
+    using a character-based estimate.
+
+    Returns:
+        True if the encoding was loaded
+    """
+    global _ENCODING
+    try:
+        _ENCODING = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e!r}")
+        return False
+    # Drop counts estimated before the encoding was available
+    count_tokens.cache_clear()
+    _prompt_static_tokens.cache_clear()
+    return True
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Count tokens in text (an approximation for non-OpenAI models)."""
+    if _ENCODING is None:
+        # Roughly 4 characters per token for English text
+        return (len(text) + 3) // 4
+    return len(_ENCODING.encode(text))
+
+
+@cache
+def _prompt_static_tokens() -> int:
+    """Token count of the scoring prompts without the message."""
+    return count_tokens(SCORING_SYSTEM_PROMPT) + count_tokens(
+        f'{SCORING_USER_PREFIX}""{SCORING_USER_SUFFIX}'
+    )
 
 
 class ScoringAgent:
@@ -46,138 +244,63 @@ class ScoringAgent:
         workflow = StateGraph(AgentState)
 
         # Add nodes
-        workflow.add_node("validate_domain", self._validate_domain)
-        workflow.add_node("score_emotion", self._score_emotion)
+        workflow.add_node("analyze", self._analyze)
         workflow.add_node("route_action", self._route_action)
 
         # Define edges
-        workflow.set_entry_point("validate_domain")
-        workflow.add_conditional_edges(
-            "validate_domain",
-            self._should_continue_scoring,
-            {
-                "score": "score_emotion",
-                "end": END,
-            },
-        )
-        workflow.add_edge("score_emotion", "route_action")
+        workflow.set_entry_point("analyze")
+        workflow.add_edge("analyze", "route_action")
         workflow.add_edge("route_action", END)
 
         return workflow.compile()
 
-    async def _validate_domain(self, state: AgentState) -> AgentState:
-        """Validate if message is in domain."""
-        prompt = DOMAIN_VALIDATION_PROMPT.format(message=state["message"])
-
-        result = await self.llm.ainvoke([HumanMessage(content=prompt)])
-        response_text = result.content
-
-        # Parse JSON response (handle markdown code blocks)
-        try:
-            # Strip markdown code blocks if present
-            cleaned_text = response_text.strip()
-            if cleaned_text.startswith("```"):
-                # Remove ```json or ``` at start and ``` at end
-                lines = cleaned_text.split("\n")
-                if lines[0].startswith("```"):
-                    lines = lines[1:]
-                if lines and lines[-1].strip() == "```":
-                    lines = lines[:-1]
-                cleaned_text = "\n".join(lines).strip()
-
-            parsed = json.loads(cleaned_text)
-            state["domain_match"] = parsed.get("domain_match", False)
-            state["domain_reasoning"] = parsed.get("reasoning", "")
-        except json.JSONDecodeError:
-            # Fallback if JSON parsing fails
-            state["domain_match"] = False
-            state["domain_reasoning"] = f"Failed to parse domain validation response: {response_text[:100]}"
-
-        # Estimate tokens (rough approximation)
-        state["tokens_used"] = state.get("tokens_used", 0) + len(prompt.split()) + len(
-            response_text.split()
-        )
+    async def _analyze(self, state: AgentState) -> dict:
+        """Validate domain and score emotional distress in a single LLM call.
 
-        return state
-
-    async def _score_emotion(self, state: AgentState) -> AgentState:
-        """Score emotional distress level."""
-        prompt = EMOTIONAL_SCORING_PROMPT.format(message=state["message"])
-
-        result = await self.llm.ainvoke([HumanMessage(content=prompt)])
-        response_text = result.content
-
-        # Parse JSON response (handle markdown code blocks)
-        try:
-            # Strip markdown code blocks if present
-            cleaned_text = response_text.strip()
-            if cleaned_text.startswith("```"):
-                # Remove ```json or ``` at start and ``` at end
-                lines = cleaned_text.split("\n")
-                if lines[0].startswith("```"):
-                    lines = lines[1:]
-                if lines and lines[-1].strip() == "```":
-                    lines = lines[:-1]
-                cleaned_text = "\n".join(lines).strip()
-
-            parsed = json.loads(cleaned_text)
-            state["score"] = parsed.get("score", 5)
-            state["confidence"] = parsed.get("confidence", 0.5)
-            state["reasoning"] = parsed.get("reasoning", "")
-            state["key_indicators"] = parsed.get("key_indicators", [])
-        except json.JSONDecodeError:
-            # Fallback if JSON parsing fails
-            state["score"] = 5
-            state["confidence"] = 0.3
-            state["reasoning"] = f"Failed to parse scoring response: {response_text[:100]}"
-            state["key_indicators"] = []
-
-        # Estimate tokens
-        state["tokens_used"] = state.get("tokens_used", 0) + len(prompt.split()) + len(
-            response_text.split()
-        )
+        Returns only the fields this node produces.
+        """
+        # Skip the LLM entirely for messages the keyword prefilter can reject
+        if is_out_of_domain(state.message):
+            return _out_of_domain_update(OUT_OF_DOMAIN_REASONING, tokens_used=0)
 
-        return state
+        prompt = f'{SCORING_USER_PREFIX}"{state.message}"{SCORING_USER_SUFFIX}'
+        response_text = await self._invoke(prompt)
+        update = interpret_response(response_text)
 
-    async def _route_action(self, state: AgentState) -> AgentState:
+        update["tokens_used"] = (
+            _prompt_static_tokens() + count_tokens(state.message) + count_tokens(response_text)
+        )
+
+        return update
+
+    @retry(
+        retry=retry_if_exception_type(BedrockTransientError),
+        wait=wait_exponential_jitter(initial=1, max=10),
+        # Bound the total time as well: each attempt may wait up to the read timeout
+        stop=stop_after_attempt(4) | stop_after_delay(30),
+        reraise=True,
+    )
+    async def _invoke(self, prompt: str) -> str:
+        """Call the LLM, retrying transient failures with jittered exponential backoff.
+
+        The stream is always read to the end: closing it early would end the
+        LLM run with an error callback instead of on_llm_end, marking the
+        trace failed and losing token usage.
+
+        Returns:
+            The full response text
+        """
+        accumulator = _Accumulator()
+        messages = [_SYSTEM_MESSAGE, HumanMessage(content=prompt)]
+        async with aclosing(self.llm.astream(messages)) as stream:
+            async for chunk in stream:
+                accumulator.append(chunk.content)
+        return accumulator.text()
+
+    async def _route_action(self, state: AgentState) -> dict:
         """Determine recommended action based on score."""
-        score = state["score"]
-
-        # Simple rule-based routing (no LLM needed for this)
-        if score == 10:
-            action = ActionType.EMERGENCY_ALERT
-            rationale = "Score 10 indicates crisis - immediate emergency intervention required"
-        elif score >= 8:
-            action = ActionType.BOOK_GP_APPOINTMENT
-            rationale = f"Score {score} indicates high distress - GP appointment needed"
-        elif score >= 6:
-            action = ActionType.NOTIFY_CARETAKER
-            rationale = f"Score {score} indicates moderate concern - caretaker notification"
-        elif score >= 1:
-            action = ActionType.LOG_ONLY
-            rationale = f"Score {score} indicates low concern - monitoring only"
-        else:
-            action = ActionType.OUT_OF_DOMAIN
-            rationale = "Message is out of domain"
-
-        state["recommended_action"] = action
-        state["action_rationale"] = rationale
-
-        return state
-
-    def _should_continue_scoring(self, state: AgentState) -> str:
-        """Decide whether to continue with scoring or end."""
-        if state["domain_match"]:
-            return "score"
-        else:
-            # Set out-of-domain values
-            state["score"] = -1
-            state["confidence"] = 1.0
-            state["reasoning"] = state["domain_reasoning"]
-            state["key_indicators"] = []
-            state["recommended_action"] = ActionType.OUT_OF_DOMAIN
-            state["action_rationale"] = "Message is not related to fertility or emotional support"
-            return "end"
+        action, rationale = route_score(state.score)
+        return {"recommended_action": action, "action_rationale": rationale}
 
     async def score_message(
         self,
@@ -187,25 +310,13 @@ class ScoringAgent:
         run_id: str = None
     ) -> dict:
         """Score a message and return results."""
-        initial_state: AgentState = {
-            "message": message,
-            "domain_match": False,
-            "domain_reasoning": "",
-            "score": 0,
-            "confidence": 0.0,
-            "reasoning": "",
-            "key_indicators": [],
-            "recommended_action": ActionType.LOG_ONLY,
-            "action_rationale": "",
-            "tokens_used": 0,
-            "start_time": time.time(),
-        }
+        initial_state = AgentState(message=message, start_time=time.perf_counter_ns())
 
         # Run the graph with optional config for LangSmith metadata
         final_state = await self.graph.ainvoke(initial_state, config=config)
 
         # Calculate latency
-        latency_ms = int((time.time() - final_state["start_time"]) * 1000)
+        latency_ms = (time.perf_counter_ns() - final_state["start_time"]) // 1_000_000
 
         result = {
             "score": final_state["score"],
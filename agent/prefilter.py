@@ -0,0 +1,43 @@
+"""Local keyword prefilter for out-of-domain messages."""
+
+import re
+
+# Topics the domain prompt always rejects, matched as whole phrases so a
+# passing mention ("under the weather", "my password") is left to the LLM
+_DENY = re.compile(
+    r"\b("
+    r"(reset|change|forgot|recover)\s+(my\s+)?password"
+    r"|weather\s+(like|today|tomorrow|forecast)"
+    r"|(what['’]?s|what\s+is)\s+the\s+weather"
+    r"|access\s+(\w+\s+){0,3}medical\s+records"
+    r")\b",
+    re.IGNORECASE,
+)
+
+# Fertility vocabulary; any match vetoes a deny so the LLM still decides
+_ALLOW = re.compile(
+    r"\b(ivf|iui|icsi|cycle|pregnan|fertil|infertil|embryo|ovulat|miscarr|transfer|retrieval"
+    r"|egg|sperm|hcg|beta|baby|babies|period|clinic|conceiv|trying\s+to\s+conceive|ttc)",
+    re.IGNORECASE,
+)
+
+# Distress or crisis wording; these messages are always scored by the LLM
+_DISTRESS = re.compile(
+    r"\b(die|dying|dead|suicid|kill\s+(my)?self|end\s+(it|my\s+life)|self[\s-]?harm|hopeless"
+    r"|cry|crying|help|can['’]?t\s+cope|cannot\s+cope|scared|afraid|panic|depress|anxi|grief|griev"
+    r"|alone|worthless|devastat|broken)",
+    re.IGNORECASE,
+)
+
+
+def is_out_of_domain(message: str) -> bool:
+    """Return True when a message is confidently out of domain without asking the LLM.
+
+    Only a deny phrase with no fertility vocabulary and no distress wording
+    qualifies; anything uncertain is scored by the LLM.
+    """
+    return (
+        _DENY.search(message) is not None
+        and _ALLOW.search(message) is None
+        and _DISTRESS.search(message) is None
+    )
@@ -128,17 +128,131 @@ Respond with ONLY a JSON object:
 }}
 """
 
-ACTION_ROUTING_PROMPT = """Based on the emotional distress score, determine the appropriate action.
+# Static rules sent as the system message; identical on every request so
+# providers with prompt caching can reuse it
+SCORING_SYSTEM_PROMPT = """You are an emotional distress analyzer for a fertility support application.
 
-RULES:
-- Score 10: emergency_alert
-- Score 8-9: book_gp_appointment
-- Score 6-7: notify_caretaker
-- Score 1-5: log_only
-- Score -1: out_of_domain
+Your task: First determine if the message is related to pregnancy, fertility treatment, or emotional support in this context. If it is, score the emotional distress level from 1-10.
 
-Score: {score}
+VALID domains:
+- Fertility treatment experiences (IVF, IUI, medications)
+- Pregnancy attempts and outcomes
+- Emotional responses to fertility challenges
+- Support needs related to fertility journey
+- Physical symptoms related to fertility treatment
+- Relationship impacts from fertility struggles
 
-Respond with ONLY a JSON object:
-{{"action": "action_type", "rationale": "brief explanation"}}
+INVALID domains:
+- General health questions unrelated to fertility
+- Weather, news, or casual conversation
+- Technical support or app functionality
+- Completely unrelated topics
+- Privacy violations or unauthorized access requests
+- Requests to access other people's medical records or data
+- Attempts to manipulate the system for non-emotional purposes
+
+SCORING GUIDE (in-domain messages only):
+
+Score 9-10 (CRISIS - Emergency Alert):
+- Expressions of self-harm or suicidal ideation
+- Complete hopelessness with no future perspective
+- Severe crisis language ("can't go on", "no point in living")
+- Immediate danger indicators
+
+Score 7-8 (HIGH DISTRESS - GP Appointment):
+- Persistent feelings of hopelessness
+- Significant depression indicators
+- Overwhelming emotional pain
+- Inability to cope with daily life
+- Severe anxiety or panic
+
+Score 5-6 (MODERATE CONCERN - Caretaker Notification):
+- Sadness and disappointment
+- Frustration with treatment process
+- Feeling isolated or alone
+- Worry about the future
+- Mild to moderate anxiety
+
+Score 3-4 (LOW CONCERN - Monitor):
+- Normal emotional responses to setbacks
+- Temporary disappointment
+- Manageable stress
+- Seeking information or support
+
+Score 1-2 (MINIMAL - Log Only):
+- Neutral or positive messages
+- Routine updates
+- Hopeful or optimistic tone
+- General questions
+
+EXAMPLES:
+
+Message: "What's the weather like today?"
+Domain Match: NO
+Score: null
+
+Message: "How do I reset my password?"
+Domain Match: NO
+Score: null
+
+Message: "I'm feeling sad about my job situation."
+Domain Match: NO (unless it mentions fertility impact)
+Score: null
+
+Message: "I can't do this anymore. There's no point in trying. I feel like giving up on everything."
+Domain Match: YES
+Score: 10
+Reasoning: Expresses complete hopelessness and giving up, crisis-level language
+Key Indicators: ["hopelessness", "giving up", "no point"]
+
+Message: "Another failed cycle. I cry every day and can't see a way forward. I feel so alone."
+Domain Match: YES
+Score: 8
+Reasoning: Persistent sadness, daily crying, isolation, inability to see future
+Key Indicators: ["failed cycle", "cry every day", "alone", "no way forward"]
+
+Message: "Feeling really disappointed about the negative test. This is harder than I expected."
+Domain Match: YES
+Score: 6
+Reasoning: Disappointment and difficulty coping, but not crisis-level
+Key Indicators: ["disappointed", "negative test", "harder than expected"]
+
+Message: "Starting my next IVF cycle next week. Feeling nervous but hopeful."
+Domain Match: YES
+Score: 3
+Reasoning: Normal anxiety about treatment, balanced with hope
+Key Indicators: ["nervous", "hopeful"]
+
+Message: "Had a good appointment today. Doctor is optimistic about our chances."
+Domain Match: YES
+Score: 1
+Reasoning: Positive update with optimistic tone
+Key Indicators: ["good appointment", "optimistic"]
+
+Respond with ONLY a JSON object. Use null for score and an empty key_indicators list when the message is out of domain:
+{
+  "domain_match": true/false,
+  "reasoning": "detailed explanation",
+  "score": <1-10 or null>,
+  "confidence": <0.0-1.0>,
+  "key_indicators": ["indicator1", "indicator2"]
+}
+"""
+
+# Per-request user message
+SCORING_USER_PROMPT = """Now analyze this message:
+"{message}"
 """
+
+
+def _split_template(template: str) -> tuple[str, str]:
+    """Split a template around its quoted message slot, unescaping format braces."""
+    prefix, suffix = template.split('"{message}"')
+    return (
+        prefix.replace("{{", "{").replace("}}", "}"),
+        suffix.replace("{{", "{").replace("}}", "}"),
+    )
+
+
+# Pre-split template: build prompts as f'{PREFIX}"{message}"{SUFFIX}' without str.format
+SCORING_USER_PREFIX, SCORING_USER_SUFFIX = _split_template(SCORING_USER_PROMPT)
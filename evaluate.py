@@ -1,26 +1,44 @@
 """Evaluation script for the scoring agent."""
 
 import asyncio
-import json
 import statistics
 import time
 from pathlib import Path
 
 import httpx
+import orjson
 from rich.console import Console
 from rich.table import Table
-from rich.progress import track
+from rich.progress import Progress
 
 console = Console()
 
 API_BASE = "http://localhost:8000"
 
+# Scored dataset categories, in report order
+CATEGORIES = ["crisis_messages", "high_distress", "moderate_concern", "low_concern", "out_of_domain"]
+
+# Maximum number of in-flight /score requests
+MAX_CONCURRENCY = 20
+
+
+def create_client() -> httpx.AsyncClient:
+    """Create the pooled HTTP client shared by every evaluation request.
+
+    Connections are kept alive by default; a Connection header would be a
+    protocol error once HTTP/2 is negotiated.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+        timeout=30.0,
+    )
+
 
 async def load_test_dataset():
     """Load test dataset."""
     dataset_path = Path("tests/test_dataset.json")
-    with open(dataset_path) as f:
-        return json.load(f)
+    return orjson.loads(dataset_path.read_bytes())
 
 
 async def score_message(client: httpx.AsyncClient, message: str) -> dict:
@@ -29,27 +47,55 @@ async def score_message(client: httpx.AsyncClient, message: str) -> dict:
         response = await client.post(
             f"{API_BASE}/score",
             json={"message": message},
-            timeout=30.0,
         )
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     except Exception as e:
         return {"error": str(e)}
 
 
-async def evaluate_category(client: httpx.AsyncClient, category_name: str, messages: list) -> dict:
+async def score_all(
+    client: httpx.AsyncClient,
+    messages: list,
+    description: str,
+    progress: Progress,
+    sem: asyncio.Semaphore,
+) -> list[tuple[dict, float]]:
+    """Score messages concurrently, returning (result, latency_ms) in input order."""
+    task = progress.add_task(description, total=len(messages))
+
+    async def _bounded(msg_data: dict) -> tuple[dict, float]:
+        async with sem:
+            start = time.perf_counter()
+            result = await score_message(client, msg_data["message"])
+            latency = (time.perf_counter() - start) * 1000
+        progress.advance(task)
+        return result, latency
+
+    return await asyncio.gather(*[_bounded(m) for m in messages])
+
+
+async def evaluate_category(
+    client: httpx.AsyncClient,
+    category_name: str,
+    messages: list,
+    progress: Progress,
+    sem: asyncio.Semaphore,
+) -> dict:
     """Evaluate a category of messages."""
     console.print(f"\n[bold cyan]Evaluating {category_name}...[/bold cyan]")
 
+    scored = await score_all(client, messages, f"Testing {category_name}", progress, sem)
+    return summarize_category(messages, scored)
+
+
+def summarize_category(messages: list, scored: list[tuple[dict, float]]) -> dict:
+    """Build per-message results and statistics from (result, latency_ms) pairs."""
     results = []
     latencies = []
     tokens = []
 
-    for msg_data in track(messages, description=f"Testing {category_name}"):
-        start = time.time()
-        result = await score_message(client, msg_data["message"])
-        latency = (time.time() - start) * 1000
-
+    for msg_data, (result, latency) in zip(messages, scored):
         if "error" not in result:
             latencies.append(latency)
             tokens.append(result.get("tokens_used", 0))
@@ -81,15 +127,24 @@ async def evaluate_category(client: httpx.AsyncClient, category_name: str, messa
     }
 
 
-async def evaluate_attacks(client: httpx.AsyncClient, attacks: list) -> dict:
+async def evaluate_attacks(
+    client: httpx.AsyncClient,
+    attacks: list,
+    progress: Progress,
+    sem: asyncio.Semaphore,
+) -> list:
     """Evaluate attack scenarios."""
     console.print("\n[bold red]Evaluating Attack Scenarios...[/bold red]")
 
-    results = []
+    scored = await score_all(client, attacks, "Testing attacks", progress, sem)
+    return summarize_attacks(attacks, scored)
 
-    for attack in track(attacks, description="Testing attacks"):
-        result = await score_message(client, attack["message"])
 
+def summarize_attacks(attacks: list, scored: list[tuple[dict, float]]) -> list:
+    """Build per-attack results from (result, latency_ms) pairs, skipping rejected requests."""
+    results = []
+
+    for attack, (result, _) in zip(attacks, scored):
         if "error" not in result:
             results.append(
                 {
@@ -104,6 +159,14 @@ async def evaluate_attacks(client: httpx.AsyncClient, attacks: list) -> dict:
     return results
 
 
+def percentiles(latencies: list[float]) -> tuple[float, float]:
+    """Return (p50, p95) from a single sort of the latencies."""
+    ordered = sorted(latencies)
+    mid = len(ordered) // 2
+    p50 = ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+    return p50, ordered[int(len(ordered) * 0.95)]
+
+
 def print_category_results(category_name: str, data: dict):
     """Print results for a category."""
     results = data["results"]
@@ -147,9 +210,10 @@ def print_category_results(category_name: str, data: dict):
     console.print(f"  Mean Error: {statistics.mean(errors):.2f}")
 
     if latencies:
+        p50, p95 = percentiles(latencies)
         console.print(f"\n[bold]Performance:[/bold]")
-        console.print(f"  p50 Latency: {statistics.median(latencies):.0f}ms")
-        console.print(f"  p95 Latency: {sorted(latencies)[int(len(latencies)*0.95)]:.0f}ms")
+        console.print(f"  p50 Latency: {p50:.0f}ms")
+        console.print(f"  p95 Latency: {p95:.0f}ms")
         console.print(f"  Mean Tokens: {statistics.mean(tokens_list):.0f}")
 
 
@@ -182,35 +246,41 @@ async def main():
     console.print("[bold green]Fertility Support Agent Evaluation[/bold green]")
     console.print("=" * 60)
 
-    # Check server health
-    try:
-        async with httpx.AsyncClient() as client:
+    async with create_client() as client:
+        # Check server health
+        try:
             response = await client.get(f"{API_BASE}/health", timeout=5.0)
-            health = response.json()
+            health = orjson.loads(response.content)
             console.print(f"\n[bold]Server Status:[/bold] {health['status']}")
             console.print(f"[bold]Bedrock:[/bold] {'✓' if health['bedrock_available'] else '✗'}")
-    except Exception as e:
-        console.print(f"[red]Error: Server not available at {API_BASE}[/red]")
-        console.print(f"[red]Please start the server with: uv run uvicorn main:app[/red]")
-        return
-
-    # Load dataset
-    dataset = await load_test_dataset()
-
-    # Evaluate each category
-    async with httpx.AsyncClient() as client:
-        all_results = {}
+        except Exception as e:
+            console.print(f"[red]Error: Server not available at {API_BASE}[/red]")
+            console.print(f"[red]Please start the server with: uv run uvicorn main:app[/red]")
+            return
+
+        # Load dataset
+        dataset = await load_test_dataset()
+
+        # Evaluate all categories and attacks concurrently, sharing one concurrency cap
+        categories = [category for category in CATEGORIES if category in dataset]
+        sem = asyncio.Semaphore(MAX_CONCURRENCY)
+        with Progress(console=console) as progress:
+            category_results, attack_results = await asyncio.gather(
+                asyncio.gather(
+                    *[
+                        evaluate_category(client, category, dataset[category], progress, sem)
+                        for category in categories
+                    ]
+                ),
+                evaluate_attacks(client, dataset.get("attack_scenarios", []), progress, sem),
+            )
 
-        # Test normal categories
-        for category in ["crisis_messages", "high_distress", "moderate_concern", "low_concern", "out_of_domain"]:
-            if category in dataset:
-                results = await evaluate_category(client, category, dataset[category])
-                all_results[category] = results
-                print_category_results(category, results)
+        # Print tables once everything has completed
+        all_results = dict(zip(categories, category_results))
+        for category, results in all_results.items():
+            print_category_results(category, results)
 
-        # Test attacks
         if "attack_scenarios" in dataset:
-            attack_results = await evaluate_attacks(client, dataset["attack_scenarios"])
             print_attack_results(attack_results)
 
     # Overall summary
@@ -232,7 +302,7 @@ async def main():
         console.print(f"\n[bold]Overall Performance:[/bold]")
         console.print(f"  Total Tests: {len(all_errors)}")
         console.print(f"  Mean Latency: {statistics.mean(all_latencies):.0f}ms")
-        console.print(f"  p95 Latency: {sorted(all_latencies)[int(len(all_latencies)*0.95)]:.0f}ms")
+        console.print(f"  p95 Latency: {percentiles(all_latencies)[1]:.0f}ms")
         console.print(f"  Mean Tokens: {statistics.mean(all_tokens):.0f}")
         console.print(f"  Mean Error: {statistics.mean(all_errors):.2f}")
 
@@ -0,0 +1,274 @@
+"""Offline evaluation through Bedrock batch inference.
+
+Submits every dataset message, attack scenarios included, as one record of a
+Bedrock model invocation job (roughly half the on-demand price, no rate
+limits), waits for the job, then applies the same validation, sanitizing,
+parsing and action routing as the API locally so the results match those
+produced by evaluate.py. Messages the API would reject with 400 are reported
+as errors without being submitted.
+
+Required environment variables:
+    BATCH_S3_URI     S3 prefix for job input/output, e.g. s3://my-bucket/fertility-eval
+    BATCH_ROLE_ARN   IAM role Bedrock assumes to read and write that prefix
+
+Optional:
+    BATCH_MODEL_ID   Bedrock model ID (default: HOLISTIC_AI_MODEL or Claude 3.5 Sonnet)
+    AWS_REGION       Region of the Bedrock endpoint (default: us-east-1)
+
+Note: Bedrock rejects jobs below its per-model minimum record count, so small
+datasets may need to be run through evaluate.py instead.
+"""
+
+import os
+import statistics
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import boto3
+import orjson
+from dotenv import load_dotenv
+
+from agent.graph import OUT_OF_DOMAIN_REASONING, interpret_response, route_score
+from agent.prefilter import is_out_of_domain
+from agent.prompts import SCORING_SYSTEM_PROMPT, SCORING_USER_PREFIX, SCORING_USER_SUFFIX
+from evaluate import (
+    CATEGORIES,
+    console,
+    print_attack_results,
+    print_category_results,
+    summarize_attacks,
+    summarize_category,
+)
+from security.injection import detector
+from security.validation import ValidationError, validate_message
+
+load_dotenv()
+
+# Seconds between job status checks
+POLL_INTERVAL = 60
+
+_TERMINAL_STATUSES = {"Completed", "PartiallyCompleted", "Failed", "Stopped", "Expired"}
+
+# Dataset sections submitted to the job, in report order
+SECTIONS = [*CATEGORIES, "attack_scenarios"]
+
+
+def build_records(dataset: dict) -> tuple[list[dict], dict[str, dict]]:
+    """Build batch records for messages that need the LLM.
+
+    Returns:
+        Tuple of (records, local_results) where local_results holds messages
+        rejected by validation (as errors) or by the prefilter, keyed by record ID
+    """
+    records = []
+    local_results = {}
+
+    for section in SECTIONS:
+        for i, msg_data in enumerate(dataset.get(section, [])):
+            record_id = f"{section}-{i}"
+
+            # Same checks as /score, which answers 400 for these
+            try:
+                message = validate_message(msg_data["message"])
+            except ValidationError as e:
+                local_results[record_id] = {"error": str(e)}
+                continue
+            message = detector.sanitize(message)
+
+            if is_out_of_domain(message):
+                local_results[record_id] = {
+                    "domain_match": False,
+                    "reasoning": OUT_OF_DOMAIN_REASONING,
+                    "score": -1,
+                    "confidence": 1.0,
+                    "key_indicators": [],
+                    "tokens_used": 0,
+                }
+                continue
+
+            records.append(
+                {
+                    "recordId": record_id,
+                    "modelInput": {
+                        "anthropic_version": "bedrock-2023-05-31",
+                        "max_tokens": 1024,
+                        "system": SCORING_SYSTEM_PROMPT,
+                        "messages": [
+                            {
+                                "role": "user",
+                                "content": [
+                                    {
+                                        "type": "text",
+                                        "text": f'{SCORING_USER_PREFIX}"{message}"{SCORING_USER_SUFFIX}',
+                                    }
+                                ],
+                            }
+                        ],
+                    },
+                }
+            )
+
+    return records, local_results
+
+
+def submit_job(records: list[dict], s3_uri: str, role_arn: str, model_id: str, region: str) -> str:
+    """Upload records as JSONL and start a model invocation job.
+
+    Returns:
+        Job ARN
+    """
+    job_name = f"fertility-eval-{int(time.time())}"
+    parsed_uri = urlparse(s3_uri)
+    bucket, prefix = parsed_uri.netloc, parsed_uri.path.strip("/")
+    input_key = f"{prefix}/{job_name}/input.jsonl".lstrip("/")
+
+    body = b"\n".join(orjson.dumps(record) for record in records)
+    boto3.client("s3", region_name=region).put_object(Bucket=bucket, Key=input_key, Body=body)
+
+    response = boto3.client("bedrock", region_name=region).create_model_invocation_job(
+        jobName=job_name,
+        roleArn=role_arn,
+        modelId=model_id,
+        inputDataConfig={"s3InputDataConfig": {"s3Uri": f"s3://{bucket}/{input_key}"}},
+        outputDataConfig={
+            "s3OutputDataConfig": {"s3Uri": f"s3://{bucket}/{prefix}/{job_name}/output/"}
+        },
+    )
+    return response["jobArn"]
+
+
+def wait_for_job(job_arn: str, region: str) -> dict:
+    """Poll a model invocation job until it reaches a terminal status."""
+    client = boto3.client("bedrock", region_name=region)
+
+    with console.status("Waiting for batch job...") as status:
+        while True:
+            job = client.get_model_invocation_job(jobIdentifier=job_arn)
+            status.update(f"Batch job status: {job['status']}")
+            if job["status"] in _TERMINAL_STATUSES:
+                return job
+            time.sleep(POLL_INTERVAL)
+
+
+def fetch_outputs(job: dict, region: str) -> dict[str, dict]:
+    """Download job output and interpret each record like the agent would.
+
+    Returns:
+        Scoring fields keyed by record ID
+    """
+    input_uri = urlparse(job["inputDataConfig"]["s3InputDataConfig"]["s3Uri"])
+    output_uri = urlparse(job["outputDataConfig"]["s3OutputDataConfig"]["s3Uri"])
+    job_id = job["jobArn"].rsplit("/", 1)[-1]
+    output_key = f"{output_uri.path.strip('/')}/{job_id}/{Path(input_uri.path).name}.out"
+
+    obj = boto3.client("s3", region_name=region).get_object(
+        Bucket=output_uri.netloc, Key=output_key
+    )
+
+    outputs = {}
+    for line in obj["Body"].read().splitlines():
+        if not line.strip():
+            continue
+        record = orjson.loads(line)
+        if "modelOutput" not in record:
+            outputs[record["recordId"]] = {"error": str(record.get("error", "missing output"))}
+            continue
+
+        response_text = "\n".join(
+            block["text"]
+            for block in record["modelOutput"].get("content", [])
+            if block.get("type") == "text"
+        )
+        usage = record["modelOutput"].get("usage", {})
+        result = interpret_response(response_text)
+        result["tokens_used"] = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+        outputs[record["recordId"]] = result
+
+    return outputs
+
+
+def collect_results(
+    section: str, messages: list, outputs: dict[str, dict]
+) -> list[tuple[dict, float]]:
+    """Complete each message's output with action routing and injection detection.
+
+    Returns:
+        (result, latency_ms) pairs as evaluate.py produces them; batch jobs have
+        no per-request latency, so it is always 0
+    """
+    scored = []
+    for i, msg_data in enumerate(messages):
+        result = dict(outputs.get(f"{section}-{i}", {"error": "missing record"}))
+        if "error" not in result:
+            action, rationale = route_score(result["score"])
+            is_injection, _ = detector.detect(msg_data["message"])
+            result.update(
+                recommended_action=action,
+                action_rationale=rationale,
+                injection_detected=is_injection,
+            )
+        scored.append((result, 0.0))
+    return scored
+
+
+def main():
+    """Run the batch evaluation."""
+    s3_uri = os.environ.get("BATCH_S3_URI")
+    role_arn = os.environ.get("BATCH_ROLE_ARN")
+    if not s3_uri or not role_arn:
+        console.print("[red]BATCH_S3_URI and BATCH_ROLE_ARN must be set[/red]")
+        return
+
+    model_id = os.environ.get(
+        "BATCH_MODEL_ID",
+        os.environ.get("HOLISTIC_AI_MODEL", "anthropic.claude-3-5-sonnet-20241022-v2:0"),
+    )
+    region = os.environ.get("AWS_REGION", "us-east-1")
+
+    console.print("[bold green]Fertility Support Agent Batch Evaluation[/bold green]")
+    console.print("=" * 60)
+
+    dataset = orjson.loads(Path("tests/test_dataset.json").read_bytes())
+    records, outputs = build_records(dataset)
+    console.print(f"Submitting {len(records)} records ({len(outputs)} resolved locally)")
+
+    job = wait_for_job(submit_job(records, s3_uri, role_arn, model_id, region), region)
+    if job["status"] not in ("Completed", "PartiallyCompleted"):
+        console.print(
+            f"[red]Batch job ended with status {job['status']}: {job.get('message', '')}[/red]"
+        )
+        return
+
+    outputs.update(fetch_outputs(job, region))
+
+    all_tokens = []
+    for category in CATEGORIES:
+        messages = dataset.get(category, [])
+        if not messages:
+            continue
+
+        data = summarize_category(messages, collect_results(category, messages, outputs))
+        all_tokens.extend(data["tokens"])
+        # Batch jobs have no per-request latency
+        data["latencies"] = []
+        print_category_results(category, data)
+
+    attacks = dataset.get("attack_scenarios", [])
+    if attacks:
+        scored = collect_results("attack_scenarios", attacks, outputs)
+        all_tokens.extend(result["tokens_used"] for result, _ in scored if "error" not in result)
+        print_attack_results(summarize_attacks(attacks, scored))
+
+    if all_tokens:
+        console.print("\n[bold]Batch Cost:[/bold]")
+        console.print(f"  Mean Tokens: {statistics.mean(all_tokens):.0f}")
+        # Batch inference is billed at roughly half the on-demand rate
+        console.print(f"  Estimated Cost: ${sum(all_tokens) / 1_000_000 * 9 * 0.5:.4f}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        console.print("\n[yellow]Evaluation interrupted[/yellow]")
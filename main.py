@@ -1,35 +1,39 @@
 """FastAPI server for emotional support scoring."""
 
+import asyncio
 import hashlib
 import logging
 import os
+import secrets
 import time
-import uuid
+from contextlib import asynccontextmanager, suppress
 from functools import lru_cache
 from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from langsmith import Client as LangSmithClient
 from langsmith import uuid7
 from pydantic import SecretStr
-from pydantic_settings import BaseSettings
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from langchain_openai import ChatOpenAI
 
-from agent.graph import ScoringAgent
+from agent.cache import ScoreCache
+from agent.graph import ScoringAgent, load_encoding
 from models.bedrock import HolisticAIBedrockChat
-from models.schemas import HealthResponse, ScoreRequest, ScoreResponse
+from models.cache import LLMCache
+from models.schemas import ActionType, HealthResponse, ScoreRequest, ScoreResponse
 from observability.logging import log_event, setup_logging
 from observability.metrics import (
-    cache_hit_rate,
     get_metrics,
     injection_attempts_total,
+    register_lru_cache_hits,
+    scoring_cache_hits_total,
+    scoring_cache_misses_total,
     scoring_cost_usd,
     scoring_errors_total,
     scoring_latency_seconds,
@@ -37,6 +41,7 @@ from observability.metrics import (
     scoring_tokens_used,
 )
 from security.injection import detector
+from security.rate_limit import RateLimitMiddleware
 from security.validation import ValidationError, validate_message
 
 # Load environment variables
@@ -46,6 +51,8 @@ load_dotenv()
 class Settings(BaseSettings):
     """Application settings."""
 
+    model_config = SettingsConfigDict(env_file=".env", frozen=True)
+
     # LLM Provider ("openai" or "holistic_ai")
     llm_provider: str = "openai"
 
@@ -62,6 +69,7 @@ class Settings(BaseSettings):
         "https://ctwa92wg1b.execute-api.us-east-1.amazonaws.com/prod/invoke"
     )
     holistic_ai_model: str = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+    holistic_ai_temperature: float = 0.7  # 0 enables the LLM response cache
 
     # LangSmith
     langsmith_api_key: Optional[str] = None
@@ -72,22 +80,36 @@ class Settings(BaseSettings):
     # Application
     log_level: str = "INFO"
     cache_enabled: bool = True
+    cache_max_size: int = 10_000
+    cache_ttl_seconds: int = 3600
+    redis_url: Optional[str] = None  # Shared L2 cache across workers
     rate_limit_per_minute: int = 60
+    health_probe_interval: int = 0  # Seconds between background LLM probes (0 = off)
     max_message_length: int = 2000
     environment: str = "production"
     version: str = "0.1.0"
 
-    class Config:
-        env_file = ".env"
+    # Server (None = 2 * CPU cores + 1 uvicorn worker processes)
+    workers: Optional[int] = None
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load settings once; later calls reuse the parsed instance."""
+    return Settings()
 
 
 # Initialize settings
-settings = Settings()
+settings = get_settings()
+
 
 # Setup logging
 setup_logging(settings.log_level)
 logger = logging.getLogger(__name__)
 
+# Per-request success events are debug-only in production
+SUCCESS_LOG_LEVEL = "DEBUG" if settings.environment == "production" else "INFO"
+
 # Setup LangSmith if configured
 langsmith_enabled = False
 langsmith_client = None
@@ -110,11 +132,96 @@ if settings.langsmith_api_key and settings.langsmith_tracing:
 else:
     logger.info("LangSmith tracing disabled")
 
+# LangSmith run metadata and tags that are the same for every request
+_LANGSMITH_BASE_METADATA = {
+    "user_id": settings.holistic_ai_team_id,
+    "model": settings.holistic_ai_model,
+    "version": settings.version,
+    "environment": settings.environment,
+    "cache_enabled": settings.cache_enabled,
+}
+_LANGSMITH_TAGS_INJECTION = ["fertility-support", "emotional-scoring", "injection-detected"]
+_LANGSMITH_TAGS_CLEAN = ["fertility-support", "emotional-scoring", "injection-clean"]
+
+score_cache = ScoreCache(maxsize=settings.cache_max_size, ttl=settings.cache_ttl_seconds)
+llm_cache = LLMCache(maxsize=settings.cache_max_size, ttl=settings.cache_ttl_seconds)
+
+# A probe result older than this is refreshed when /health is called
+HEALTH_PROBE_MAX_AGE = 60
+# Startup waits at most this long for the first probe (which also opens the
+# LLM connection) before accepting requests
+WARMUP_TIMEOUT = 5
+
+
+async def ping_llm() -> None:
+    """Check the LLM provider is reachable without requesting a completion.
+
+    Nothing is generated or billed, so probing does not cost more with more
+    workers.
+    """
+    if isinstance(llm, HolisticAIBedrockChat):
+        if not await llm.aping():
+            raise ConnectionError("Bedrock proxy returned a server error")
+    else:
+        await llm.root_async_client.models.list()
+
+
+async def check_llm(app: FastAPI, timeout: float) -> None:
+    """Probe the LLM provider and record the outcome on app.state."""
+    try:
+        await asyncio.wait_for(ping_llm(), timeout=timeout)
+        app.state.llm_available = True
+    except Exception as e:
+        logger.warning(f"LLM health probe failed: {e!r}")
+        app.state.llm_available = False
+    app.state.llm_checked_at = time.monotonic()
+
+
+async def probe_llm(app: FastAPI, interval: int):
+    """Periodically check LLM connectivity, keeping the connection pool warm."""
+    while True:
+        await asyncio.sleep(interval)
+        await check_llm(app, timeout=interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start shared resources and background probes; release them on shutdown."""
+    # Redis backs the shared rate limit and, when caching is on, the L2 caches
+    if settings.redis_url and await score_cache.connect(settings.redis_url):
+        logger.info("Redis rate limiting enabled")
+        if settings.cache_enabled:
+            llm_cache.redis = score_cache.redis
+            logger.info("Redis L2 cache enabled")
+
+    # tiktoken may download its BPE file; keep that off the event loop
+    await asyncio.to_thread(load_encoding)
+
+    # Warm up: the first request should not pay for DNS and the TLS handshake
+    await check_llm(app, timeout=WARMUP_TIMEOUT)
+    probe_task = None
+    if settings.health_probe_interval > 0:
+        probe_task = asyncio.create_task(probe_llm(app, settings.health_probe_interval))
+
+    yield
+
+    if probe_task is not None:
+        probe_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await probe_task
+    await score_cache.close()
+    if isinstance(llm, HolisticAIBedrockChat):
+        await llm.aclose()
+
+
 # Initialize FastAPI
 app = FastAPI(
     title="Fertility Support Agent",
     description="Emotional distress scoring for fertility treatment patients",
     version="0.1.0",
+    lifespan=lifespan,
+    # Serialize JSON bodies with orjson instead of the stdlib encoder
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS to allow dashboard access (only in dev environment)
@@ -128,10 +235,17 @@ if settings.environment == "dev":
     )
     logger.info("CORS middleware enabled for development environment")
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Compress larger bodies (Prometheus scrapes, long reasoning) for clients
+# that send Accept-Encoding: gzip; small responses are not worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=4)
+
+# Rate limiting (rejects excess /score requests before routing); counted in
+# Redis when connected so the limit holds across workers
+app.add_middleware(
+    RateLimitMiddleware,
+    rate_per_minute=settings.rate_limit_per_minute,
+    get_redis=lambda: score_cache.redis,
+)
 
 # Initialize LLM based on provider setting
 if settings.llm_provider == "openai":
@@ -152,8 +266,9 @@ elif settings.llm_provider == "holistic_ai":
         api_token=SecretStr(settings.holistic_ai_api_token),
         api_endpoint=settings.holistic_ai_api_endpoint,
         model=settings.holistic_ai_model,
-        temperature=0.7,
+        temperature=settings.holistic_ai_temperature,
         max_tokens=1024,
+        response_cache=llm_cache if settings.cache_enabled else None,
     )
     logger.info(f"Initialized HolisticAI Bedrock LLM with model: {settings.holistic_ai_model}")
 else:
@@ -161,9 +276,23 @@ else:
 
 agent = ScoringAgent(llm)
 
-# Simple in-memory cache
-cache_hits = 0
-cache_misses = 0
+register_lru_cache_hits(
+    "detector_cache_hits",
+    "Total number of memoized message analysis and validation results reused",
+    {"analyze": detector.analyze, "validate": validate_message},
+)
+
+# Labelled metric children, bound once rather than looked up per request
+_SUCCESS_REQUESTS = {
+    action.value: scoring_requests_total.labels(status="success", action=action.value)
+    for action in ActionType
+}
+_VALIDATION_ERRORS = scoring_errors_total.labels(error_type="validation")
+_INTERNAL_ERRORS = scoring_errors_total.labels(error_type="internal")
+
+# Claude 3.5 Sonnet pricing (~$3/1M input, ~$15/1M output tokens), assuming a
+# rough 50/50 split
+_COST_PER_TOKEN = 9 / 1_000_000
 
 
 def construct_langsmith_url(run_id: str, project: str, endpoint: str) -> str:
@@ -183,31 +312,44 @@ def construct_langsmith_url(run_id: str, project: str, endpoint: str) -> str:
     return f"{base_url}/projects/{project}/runs/{run_id}"
 
 
-@lru_cache(maxsize=100)
-def cached_score(message_hash: str, message: str) -> dict:
-    """Cache scoring results by message hash."""
-    # This is a placeholder - actual scoring happens in the endpoint
-    # The cache is used to store results after scoring
-    return {}
+# Strong references to fire-and-forget tasks so they are not garbage collected
+_background_tasks: set[asyncio.Task] = set()
+
+
+async def update_langsmith_tags(run_id, tags: list[str]) -> None:
+    """Add tags to a LangSmith run; failures are logged, never raised."""
+    try:
+        # The LangSmith client is synchronous, so keep its HTTP call off the loop
+        await asyncio.to_thread(langsmith_client.update_run, run_id=run_id, tags=tags)
+    except Exception as e:
+        logger.warning(f"Failed to update LangSmith run with dynamic tags: {e}")
 
 
 @app.post("/score", response_model=ScoreResponse)
-@limiter.limit(f"{settings.rate_limit_per_minute}/minute")
-async def score_message(request: Request, score_request: ScoreRequest) -> ScoreResponse:
+async def score_message(request: Request, score_request: ScoreRequest) -> Response:
     """Score a message for emotional distress."""
-    global cache_hits, cache_misses
-
-    # Generate UUID v7 for correlation and LangSmith run_id
-    correlation_uuid = uuid7()
-    correlation_id = str(correlation_uuid)
-    start_time = time.time()
+    # LangSmith needs a UUID v7 run_id; otherwise a random hex string is enough
+    # for log correlation and avoids building a UUID object per request
+    if langsmith_enabled:
+        correlation_uuid = uuid7()
+        correlation_id = str(correlation_uuid)
+    else:
+        correlation_uuid = None
+        correlation_id = secrets.token_hex(16)
+    start_time = time.perf_counter()
 
     try:
-        # Validate message
-        message = validate_message(score_request.message, settings.max_message_length)
+        # Validate message (the privacy screen already ran with the injection
+        # scan when the request was parsed)
+        message = validate_message(
+            score_request.message, settings.max_message_length, check_privacy=False
+        )
+        analysis = score_request.analysis
+        if analysis.privacy_violation:
+            raise ValidationError("Message contains unauthorized access request")
 
         # Check for injection attempts
-        is_injection, patterns = detector.detect(message)
+        is_injection, patterns = analysis.is_injection, analysis.patterns
         if is_injection:
             injection_attempts_total.inc()
             log_event(
@@ -225,13 +367,9 @@ async def score_message(request: Request, score_request: ScoreRequest) -> ScoreR
         message = detector.sanitize(message)
 
         # Check cache
-        message_hash = hashlib.sha256(message.encode()).hexdigest()[:16]
-
-        if settings.cache_enabled:
-            # Try to get from cache (simplified - in production use Redis)
-            # For now, we'll skip caching to keep it simple for hackathon
-            cache_misses += 1
-            pass
+        # Collision-resistant: the hash of client-supplied text keys a cache
+        # that may be shared across workers through Redis
+        message_hash = hashlib.blake2b(message.encode(), digest_size=16).hexdigest()
 
         # Prepare LangSmith config with proper structure
         langsmith_config = None
@@ -240,62 +378,59 @@ async def score_message(request: Request, score_request: ScoreRequest) -> ScoreR
                 "run_name": "score_message",
                 "run_id": correlation_uuid,  # Use UUID object, not string
                 "metadata": {
-                    "user_id": settings.holistic_ai_team_id,
-                    "model": settings.holistic_ai_model,
-                    "version": settings.version,
-                    "environment": settings.environment,
+                    **_LANGSMITH_BASE_METADATA,
                     "request_id": correlation_id,
                     "message_hash": message_hash,
                     "injection_detected": is_injection,
                     "injection_patterns": patterns if is_injection else [],
                     "message_length": len(message),
-                    "cache_enabled": settings.cache_enabled,
                 },
-                "tags": [
-                    "fertility-support",
-                    "emotional-scoring",
-                    f"injection-{'detected' if is_injection else 'clean'}",
-                ],
+                "tags": _LANGSMITH_TAGS_INJECTION if is_injection else _LANGSMITH_TAGS_CLEAN,
             }
 
         # Score the message with LangSmith metadata
-        result = await agent.score_message(
-            message,
-            config=langsmith_config,
-            langsmith_enabled=langsmith_enabled,
-            run_id=correlation_id
-        )
+        async def score() -> dict:
+            return await agent.score_message(
+                message,
+                config=langsmith_config,
+                langsmith_enabled=langsmith_enabled,
+                run_id=correlation_id
+            )
+
+        # Serve repeated messages from the cache; concurrent identical
+        # requests share a single LLM call
+        cache_hit = False
+        if settings.cache_enabled:
+            result, cache_hit = await score_cache.get_or_score(message_hash, score)
+            if cache_hit:
+                scoring_cache_hits_total.inc()
+            else:
+                scoring_cache_misses_total.inc()
+        else:
+            result = await score()
 
         # Update LangSmith run with dynamic tags from key_indicators
-        if langsmith_enabled and langsmith_client and "key_indicators" in result:
-            try:
-                # Add key_indicators as tags to the run
-                dynamic_tags = [
-                    f"indicator:{indicator.lower().replace(' ', '-')}"
-                    for indicator in result["key_indicators"]
-                ]
-                # Update the run with additional tags
-                langsmith_client.update_run(
-                    run_id=correlation_uuid,
-                    tags=dynamic_tags
-                )
-            except Exception as e:
-                logger.warning(f"Failed to update LangSmith run with dynamic tags: {e}")
+        # (a cache hit has no run of its own to tag)
+        if langsmith_enabled and langsmith_client and not cache_hit and "key_indicators" in result:
+            # Add key_indicators as tags to the run, off the request path
+            dynamic_tags = [
+                f"indicator:{indicator.lower().replace(' ', '-')}"
+                for indicator in result["key_indicators"]
+            ]
+            task = asyncio.create_task(update_langsmith_tags(correlation_uuid, dynamic_tags))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
 
         # Calculate metrics
-        latency = time.time() - start_time
+        latency = time.perf_counter() - start_time
         scoring_latency_seconds.observe(latency)
-        scoring_tokens_used.observe(result["tokens_used"])
-
-        # Estimate cost (Claude 3.5 Sonnet pricing: ~$3/1M input, ~$15/1M output tokens)
-        # Rough estimate: 50/50 split
-        cost = (result["tokens_used"] / 1_000_000) * 9  # Average of input/output
-        scoring_cost_usd.inc(cost)
 
-        # Update cache hit rate
-        total_requests = cache_hits + cache_misses
-        if total_requests > 0:
-            cache_hit_rate.set(cache_hits / total_requests)
+        # Estimate cost; cache hits cost nothing
+        cost = 0.0
+        if not cache_hit:
+            scoring_tokens_used.observe(result["tokens_used"])
+            cost = result["tokens_used"] * _COST_PER_TOKEN
+            scoring_cost_usd.inc(cost)
 
         # Log event
         log_event(
@@ -306,23 +441,27 @@ async def score_message(request: Request, score_request: ScoreRequest) -> ScoreR
                 "message_hash": message_hash,
                 "score": result["score"],
                 "confidence": result["confidence"],
-                "action": result["recommended_action"].value,
+                "action": result["recommended_action"],
                 "latency_ms": int(latency * 1000),
                 "tokens_used": result["tokens_used"],
                 "cost_usd": cost,
                 "injection_detected": is_injection,
+                "cache_hit": cache_hit,
             },
+            level=SUCCESS_LOG_LEVEL,
         )
 
         # Track request
-        scoring_requests_total.labels(
-            status="success",
-            action=result["recommended_action"].value,
-        ).inc()
+        action = result["recommended_action"]
+        success_requests = _SUCCESS_REQUESTS.get(action)
+        if success_requests is None:
+            success_requests = scoring_requests_total.labels(status="success", action=action)
+        success_requests.inc()
 
         # Construct LangSmith trace URL if enabled
+        # (a cache hit's run_id belongs to the request that populated the cache)
         run_url = None
-        if langsmith_enabled and "run_id" in result:
+        if langsmith_enabled and not cache_hit and "run_id" in result:
             run_url = construct_langsmith_url(
                 result["run_id"],
                 settings.langsmith_project,
@@ -340,15 +479,18 @@ async def score_message(request: Request, score_request: ScoreRequest) -> ScoreR
             action_rationale=result["action_rationale"],
             trace_id=correlation_id,
             run_url=run_url,
-            latency_ms=result["latency_ms"],
+            latency_ms=int(latency * 1000) if cache_hit else result["latency_ms"],
             tokens_used=result["tokens_used"],
             injection_detected=is_injection,
         )
 
-        return response
+        # Return a ready-made response: FastAPI would otherwise validate and
+        # serialize the model a second time against response_model. The model
+        # is encoded straight to JSON by pydantic-core, with no intermediate dict
+        return Response(response.model_dump_json(), media_type="application/json")
 
     except ValidationError as e:
-        scoring_errors_total.labels(error_type="validation").inc()
+        _VALIDATION_ERRORS.inc()
         log_event(
             logger,
             "validation_error",
@@ -358,7 +500,7 @@ async def score_message(request: Request, score_request: ScoreRequest) -> ScoreR
         raise HTTPException(status_code=400, detail=str(e))
 
     except Exception as e:
-        scoring_errors_total.labels(error_type="internal").inc()
+        _INTERNAL_ERRORS.inc()
         log_event(
             logger,
             "internal_error",
@@ -369,21 +511,24 @@ async def score_message(request: Request, score_request: ScoreRequest) -> ScoreR
 
 
 @app.get("/health", response_model=HealthResponse)
-async def health_check() -> HealthResponse:
-    """Health check endpoint."""
-    # Test Bedrock connectivity
-    bedrock_available = True
-    try:
-        # Quick test call
-        await llm.ainvoke([{"role": "user", "content": "test"}])
-    except Exception:
-        bedrock_available = False
+async def health_check(request: Request) -> Response:
+    """Health check endpoint.
 
-    return HealthResponse(
+    Reports the last probe result, re-probing (without a completion) only when
+    it is older than HEALTH_PROBE_MAX_AGE, so frequent liveness checks cost
+    almost nothing.
+    """
+    state = request.app.state
+    if time.monotonic() - state.llm_checked_at > HEALTH_PROBE_MAX_AGE:
+        await check_llm(request.app, timeout=WARMUP_TIMEOUT)
+    bedrock_available = state.llm_available
+
+    health = HealthResponse(
         status="healthy" if bedrock_available else "degraded",
         bedrock_available=bedrock_available,
         cache_enabled=settings.cache_enabled,
     )
+    return Response(health.model_dump_json(), media_type="application/json")
 
 
 @app.get("/metrics")
@@ -410,6 +555,26 @@ async def root():
 
 
 if __name__ == "__main__":
+    import importlib.util
+
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop and httptools come with uvicorn[standard] but are not available
+    # on every platform (uvloop has no Windows build)
+    workers = settings.workers or max(1, (os.cpu_count() or 1) * 2 + 1)
+    if workers > 1 and not settings.redis_url:
+        logger.warning(
+            f"Rate limits are per worker without REDIS_URL: each client may send up to "
+            f"{workers * settings.rate_limit_per_minute} requests per minute"
+        )
+
+    # Workers are spawned processes that re-import this module, so each one
+    # builds its own LLM client and connection pool
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "auto",
+        http="httptools" if importlib.util.find_spec("httptools") else "auto",
+        workers=workers,
+    )
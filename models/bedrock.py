@@ -1,14 +1,90 @@
 """HolisticAI Bedrock Proxy integration."""
 
-import json
-from typing import Any, AsyncIterator, Iterator, List, Optional
+import asyncio
+from contextlib import contextmanager
+from typing import Any, List, Optional
 
 import httpx
+import orjson
 from langchain_core.callbacks import CallbackManagerForLLMRun
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from langchain_core.outputs import ChatGeneration, ChatResult
-from pydantic import Field, SecretStr
+from pydantic import ConfigDict, Field, PrivateAttr, SecretStr
+
+from models.cache import LLMCache
+
+
+# Throttling and server-side failures worth retrying
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# API role for each LangChain message type
+_ROLE_MAP = {SystemMessage: "system", HumanMessage: "user", AIMessage: "assistant"}
+
+# Connection pool shared by every request from one model instance
+POOL_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=90)
+
+
+class BedrockTransientError(ValueError):
+    """Retryable Bedrock proxy failure (throttling, 5xx, or transport error)."""
+
+    pass
+
+
+def _format_http_error(e: httpx.HTTPStatusError) -> ValueError:
+    """Build the exception for an error response, transient if the status is retryable."""
+    # The body was read before raise_for_status, so this is already in memory
+    body = e.response.content
+    error_msg = f"Error calling Holistic AI Bedrock API: {e}\nResponse: {body.decode('utf-8', 'replace')}"
+    if e.response.status_code in RETRYABLE_STATUS_CODES:
+        return BedrockTransientError(error_msg)
+    return ValueError(error_msg)
+
+
+@contextmanager
+def _api_errors():
+    """Translate any failure of an API call into ValueError (BedrockTransientError if retryable)."""
+    try:
+        yield
+    except httpx.HTTPStatusError as e:
+        raise _format_http_error(e)
+    except (httpx.ReadTimeout, httpx.WriteTimeout) as e:
+        # The request was sent and may already have been generated and billed
+        raise ValueError(f"Error calling Holistic AI Bedrock API: {e!r}")
+    except httpx.TransportError as e:
+        raise BedrockTransientError(f"Error calling Holistic AI Bedrock API: {e}")
+    except Exception as e:
+        raise ValueError(f"Error calling Holistic AI Bedrock API: {e}")
+
+
+def _parse_body(body: bytearray) -> str:
+    """Return the text of a successful API response body."""
+    # orjson parses the bytearray in place, without a copy to bytes
+    return _extract_content(orjson.loads(body))
+
+
+def _chat_result(content: str) -> ChatResult:
+    """Wrap response text in a ChatResult."""
+    return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+
+def _extract_content(result: dict) -> str:
+    """Extract the response text from a Bedrock response, one line per text block."""
+    blocks = result.get("content")
+    if blocks:
+        if isinstance(blocks, str):
+            return blocks.rstrip("\n")
+        parts = []
+        for block in blocks:
+            if isinstance(block, dict):
+                if block.get("type") == "text" and block.get("text"):
+                    parts.append(block["text"])
+            elif isinstance(block, str):
+                parts.append(block)
+        return "\n".join(parts).rstrip("\n")
+    if "text" in result:
+        return result["text"]
+    return str(result)
 
 
 class HolisticAIBedrockChat(BaseChatModel):
@@ -27,39 +103,139 @@ class HolisticAIBedrockChat(BaseChatModel):
     temperature: float = Field(default=0.7, ge=0.0, le=1.0)
     max_tokens: int = Field(default=1024, ge=1)
     timeout: int = Field(default=60, description="Request timeout in seconds")
+    response_cache: Optional[LLMCache] = Field(
+        default=None,
+        exclude=True,
+        description="Response cache, used only when temperature is 0",
+    )
 
-    class Config:
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # HTTP clients, created on first use and reused so connections stay pooled
+    _client: Optional[httpx.Client] = PrivateAttr(default=None)
+    _aclient: Optional[httpx.AsyncClient] = PrivateAttr(default=None)
+    # Request parts that are the same for every call, built once after validation
+    _headers: dict = PrivateAttr(default_factory=dict)
+    _base_payload: dict = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context: Any) -> None:
+        """Precompute the static request headers and payload fields."""
+        super().model_post_init(__context)
+        api_token = self.api_token.get_secret_value()
+        self._headers = {
+            "Content-Type": "application/json",
+            "X-Team-ID": self.team_id,
+            "X-API-Token": api_token,
+        }
+        self._base_payload = {
+            "team_id": self.team_id,
+            "api_token": api_token,
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }
 
     @property
     def _llm_type(self) -> str:
         """Return type of LLM."""
         return "holistic-ai-bedrock"
 
-    def _extract_system_prompt(self, messages: List[BaseMessage]) -> Optional[str]:
-        """Extract system prompt from messages."""
-        for msg in messages:
-            if isinstance(msg, SystemMessage):
-                return msg.content
-        return None
+    def _http_timeout(self) -> httpx.Timeout:
+        """Fail fast on connecting and pool waits; allow the full timeout for generation."""
+        return httpx.Timeout(connect=5.0, read=self.timeout, write=10.0, pool=5.0)
+
+    def _get_client(self) -> httpx.Client:
+        """Return the shared sync HTTP client, creating it on first use."""
+        if self._client is None:
+            # http2/limits belong to the transport when one is passed explicitly;
+            # retries only re-attempt failed connects, never sent requests
+            self._client = httpx.Client(
+                transport=httpx.HTTPTransport(http2=True, limits=POOL_LIMITS, retries=1),
+                timeout=self._http_timeout(),
+            )
+        return self._client
+
+    def _get_aclient(self) -> httpx.AsyncClient:
+        """Return the shared async HTTP client, creating it on first use."""
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(http2=True, limits=POOL_LIMITS, retries=1),
+                timeout=self._http_timeout(),
+            )
+        return self._aclient
+
+    def close(self) -> None:
+        """Close the sync HTTP client."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        """Close both HTTP clients."""
+        self.close()
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+    async def aping(self) -> bool:
+        """Check the proxy is reachable with a HEAD request on the shared pool.
+
+        No completion is generated, so nothing is billed. Any response below
+        500 (including 403 or 405 for the unauthenticated method) counts as
+        reachable; transport errors are raised.
+        """
+        response = await self._get_aclient().head(self.api_endpoint)
+        return response.status_code < 500
+
+    def _cache_key(self, payload: dict) -> Optional[str]:
+        """Cache key for a request payload, or None if the response is not cacheable.
+
+        Only deterministic (temperature 0) calls are cached.
+        """
+        if self.response_cache is None or self.temperature != 0:
+            return None
+        return LLMCache.make_key(
+            {
+                "model": payload["model"],
+                "messages": payload["messages"],
+                "max_tokens": payload["max_tokens"],
+                "temperature": payload["temperature"],
+            }
+        )
 
-    def _convert_messages_to_api_format(self, messages: List[BaseMessage]) -> List[dict]:
-        """Convert LangChain messages to API format."""
+    def _split_messages(self, messages: List[BaseMessage]) -> tuple[Optional[str], List[dict]]:
+        """Split LangChain messages into the system prompt and API-format messages.
+
+        Only the first system message is used as the system prompt; message
+        types other than human/AI are sent as user messages.
+        """
+        system_prompt = None
         api_messages = []
-        
+
         for msg in messages:
-            if isinstance(msg, SystemMessage):
-                # System messages handled separately
-                continue
-            elif isinstance(msg, HumanMessage):
-                api_messages.append({"role": "user", "content": msg.content})
-            elif isinstance(msg, AIMessage):
-                api_messages.append({"role": "assistant", "content": msg.content})
+            role = _ROLE_MAP.get(type(msg))
+            if role is None:
+                # Subclasses (e.g. message chunks) miss the exact-type lookup
+                role = next((r for cls, r in _ROLE_MAP.items() if isinstance(msg, cls)), None)
+            if role == "system":
+                if system_prompt is None:
+                    system_prompt = msg.content
+            elif role is not None:
+                api_messages.append({"role": role, "content": msg.content})
             else:
-                # Handle other message types
                 api_messages.append({"role": "user", "content": str(msg.content)})
-        
-        return api_messages
+
+        return system_prompt, api_messages
+
+    def _build_payload(self, messages: List[BaseMessage]) -> dict:
+        """Build the API request body for a list of messages."""
+        system_prompt, api_messages = self._split_messages(messages)
+
+        if system_prompt:
+            # Add system prompt as first user message
+            api_messages.insert(0, {"role": "user", "content": f"System: {system_prompt}"})
+
+        return {**self._base_payload, "messages": api_messages}
 
     def _generate(
         self,
@@ -69,79 +245,34 @@ class HolisticAIBedrockChat(BaseChatModel):
         **kwargs: Any,
     ) -> ChatResult:
         """Generate response synchronously."""
-        system_prompt = self._extract_system_prompt(messages)
-        api_messages = self._convert_messages_to_api_format(messages)
+        payload = self._build_payload(messages)
 
-        payload = {
-            "team_id": self.team_id,
-            "api_token": self.api_token.get_secret_value(),
-            "model": self.model,
-            "messages": api_messages,
-            "max_tokens": self.max_tokens,
-        }
+        cache_key = self._cache_key(payload)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return _chat_result(cached)
 
-        if self.temperature is not None:
-            payload["temperature"] = self.temperature
+        with _api_errors():
+            with self._get_client().stream(
+                "POST",
+                self.api_endpoint,
+                content=orjson.dumps(payload),
+                headers=self._headers,
+            ) as response:
+                if not response.is_success:
+                    # Buffer the error body so it can be included in the message
+                    response.read()
+                    response.raise_for_status()
+                body = bytearray()
+                for chunk in response.iter_bytes():
+                    body.extend(chunk)
+            content = _parse_body(body)
 
-        if system_prompt:
-            # Add system prompt as first user message
-            payload["messages"].insert(0, {"role": "user", "content": f"System: {system_prompt}"})
+        if cache_key is not None:
+            self.response_cache.set(cache_key, content)
 
-        headers = {
-            "Content-Type": "application/json",
-            "X-Team-ID": self.team_id,
-            "X-API-Token": self.api_token.get_secret_value(),
-        }
-
-        try:
-            with httpx.Client(timeout=self.timeout) as client:
-                response = client.post(
-                    self.api_endpoint,
-                    json=payload,
-                    headers=headers,
-                )
-                response.raise_for_status()
-                result = response.json()
-
-            # Extract content from Bedrock response
-            content = ""
-            if "content" in result and len(result["content"]) > 0:
-                for content_block in result["content"]:
-                    if isinstance(content_block, dict):
-                        if content_block.get("type") == "text":
-                            text = content_block.get("text", "")
-                            if text:
-                                content += text + "\n" if content else text
-                    elif isinstance(content_block, str):
-                        content += content_block
-                content = content.rstrip("\n")
-            elif "text" in result:
-                content = result["text"]
-            else:
-                content = str(result)
-
-            message = AIMessage(content=content)
-            generation = ChatGeneration(message=message)
-            chat_result = ChatResult(generations=[generation])
-
-            return chat_result
-
-        except httpx.HTTPStatusError as e:
-            error_msg = f"Error calling Holistic AI Bedrock API: {e}"
-            if e.response:
-                try:
-                    error_detail = e.response.text
-                    error_msg += f"\nResponse: {error_detail}"
-                    try:
-                        error_json = e.response.json()
-                        error_msg += f"\nError details: {json.dumps(error_json, indent=2)}"
-                    except:
-                        pass
-                except:
-                    pass
-            raise ValueError(error_msg)
-        except Exception as e:
-            raise ValueError(f"Error calling Holistic AI Bedrock API: {e}")
+        return _chat_result(content)
 
     async def _agenerate(
         self,
@@ -151,96 +282,53 @@ class HolisticAIBedrockChat(BaseChatModel):
         **kwargs: Any,
     ) -> ChatResult:
         """Generate response asynchronously."""
-        system_prompt = self._extract_system_prompt(messages)
-        api_messages = self._convert_messages_to_api_format(messages)
+        payload = self._build_payload(messages)
 
-        payload = {
-            "team_id": self.team_id,
-            "api_token": self.api_token.get_secret_value(),
-            "model": self.model,
-            "messages": api_messages,
-            "max_tokens": self.max_tokens,
-        }
+        cache_key = self._cache_key(payload)
+        if cache_key is not None:
+            cached = await self.response_cache.aget(cache_key)
+            if cached is not None:
+                return _chat_result(cached)
 
-        if self.temperature is not None:
-            payload["temperature"] = self.temperature
+        with _api_errors():
+            async with self._get_aclient().stream(
+                "POST",
+                self.api_endpoint,
+                content=orjson.dumps(payload),
+                headers=self._headers,
+            ) as response:
+                if not response.is_success:
+                    await response.aread()
+                    response.raise_for_status()
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+            content = _parse_body(body)
 
-        if system_prompt:
-            # Add system prompt as first user message
-            payload["messages"].insert(0, {"role": "user", "content": f"System: {system_prompt}"})
+        if cache_key is not None:
+            await self.response_cache.aset(cache_key, content)
 
-        headers = {
-            "Content-Type": "application/json",
-            "X-Team-ID": self.team_id,
-            "X-API-Token": self.api_token.get_secret_value(),
-        }
+        return _chat_result(content)
 
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.api_endpoint,
-                    json=payload,
-                    headers=headers,
-                )
-                response.raise_for_status()
-                result = response.json()
-
-            # Extract content from Bedrock response
-            content = ""
-            if "content" in result and len(result["content"]) > 0:
-                for content_block in result["content"]:
-                    if isinstance(content_block, dict):
-                        if content_block.get("type") == "text":
-                            text = content_block.get("text", "")
-                            if text:
-                                content += text + "\n" if content else text
-                    elif isinstance(content_block, str):
-                        content += content_block
-                content = content.rstrip("\n")
-            elif "text" in result:
-                content = result["text"]
-            else:
-                content = str(result)
-
-            message = AIMessage(content=content)
-            generation = ChatGeneration(message=message)
-            chat_result = ChatResult(generations=[generation])
-
-            return chat_result
-
-        except httpx.HTTPStatusError as e:
-            error_msg = f"Error calling Holistic AI Bedrock API: {e}"
-            if e.response:
-                try:
-                    error_detail = e.response.text
-                    error_msg += f"\nResponse: {error_detail}"
-                    try:
-                        error_json = e.response.json()
-                        error_msg += f"\nError details: {json.dumps(error_json, indent=2)}"
-                    except:
-                        pass
-                except:
-                    pass
-            raise ValueError(error_msg)
-        except Exception as e:
-            raise ValueError(f"Error calling Holistic AI Bedrock API: {e}")
-
-    def _stream(
+    async def agenerate_many(
         self,
-        messages: list[BaseMessage],
-        stop: Optional[list[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> Iterator[ChatGeneration]:
-        """Stream not implemented for this proxy."""
-        raise NotImplementedError("Streaming not supported by HolisticAI Bedrock Proxy")
+        batches: List[List[BaseMessage]],
+        max_concurrency: int = 16,
+    ) -> List[ChatResult]:
+        """Generate responses for several conversations concurrently.
 
-    def _astream(
-        self,
-        messages: list[BaseMessage],
-        stop: Optional[list[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> AsyncIterator[ChatGeneration]:
-        """Async stream not implemented for this proxy."""
-        raise NotImplementedError("Streaming not supported by HolisticAI Bedrock Proxy")
+        Requests share the pooled HTTP/2 connection; at most max_concurrency
+        are in flight at once. Each call goes through agenerate, so callbacks,
+        tracing and the response cache apply as for a single call.
+
+        Returns:
+            One ChatResult per conversation, in input order
+        """
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def one(messages: List[BaseMessage]) -> ChatResult:
+            async with sem:
+                result = await self.agenerate([messages])
+            return ChatResult(generations=result.generations[0], llm_output=result.llm_output)
+
+        return await asyncio.gather(*(one(messages) for messages in batches))
@@ -0,0 +1,76 @@
+"""Exact-match cache for deterministic LLM responses."""
+
+import hashlib
+import logging
+from typing import Optional
+
+import orjson
+from cachetools import TTLCache
+
+from observability.metrics import llm_cache_hits_total, llm_cache_misses_total
+
+logger = logging.getLogger(__name__)
+
+# Namespace for LLM responses in a shared Redis
+REDIS_KEY_PREFIX = "llm:"
+
+
+class LLMCache:
+    """TTL-bounded cache of LLM response text keyed by the full request.
+
+    Lookups go to the in-process cache first, then to Redis when a client has
+    been attached via ``redis``. Only the async methods use Redis. Redis
+    failures are logged and treated as misses.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: int = 3600):
+        """Initialize an empty, memory-only cache."""
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._ttl = ttl
+        self.redis = None
+
+    @staticmethod
+    def make_key(request: dict) -> str:
+        """Hash the request fields that determine the response."""
+        return hashlib.sha256(orjson.dumps(request, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up key in the in-process cache."""
+        content = self._cache.get(key)
+        if content is None:
+            llm_cache_misses_total.inc()
+        else:
+            llm_cache_hits_total.inc()
+        return content
+
+    def set(self, key: str, content: str) -> None:
+        """Store content in the in-process cache."""
+        self._cache[key] = content
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Look up key in the in-process cache, then in Redis."""
+        content = self._cache.get(key)
+        if content is None and self.redis is not None:
+            try:
+                value = await self.redis.get(REDIS_KEY_PREFIX + key)
+            except Exception as e:
+                logger.warning(f"Redis get failed: {e}")
+                value = None
+            if value is not None:
+                content = value.decode()
+                self._cache[key] = content
+
+        if content is None:
+            llm_cache_misses_total.inc()
+        else:
+            llm_cache_hits_total.inc()
+        return content
+
+    async def aset(self, key: str, content: str) -> None:
+        """Store content in the in-process cache and in Redis."""
+        self._cache[key] = content
+        if self.redis is not None:
+            try:
+                await self.redis.setex(REDIS_KEY_PREFIX + key, self._ttl, content)
+            except Exception as e:
+                logger.warning(f"Redis set failed: {e}")
@@ -3,7 +3,9 @@
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator
+
+from security.injection import MessageAnalysis, detector
 
 
 class ActionType(str, Enum):
@@ -21,6 +23,8 @@ class ScoreRequest(BaseModel):
 
     message: str = Field(..., min_length=1, max_length=2000, description="Message to score")
 
+    _analysis: Optional[MessageAnalysis] = PrivateAttr(default=None)
+
     @field_validator("message")
     @classmethod
     def validate_message(cls, v: str) -> str:
@@ -29,6 +33,17 @@ class ScoreRequest(BaseModel):
             raise ValueError("Message cannot be empty or whitespace only")
         return v.strip()
 
+    @model_validator(mode="after")
+    def analyze_message(self) -> "ScoreRequest":
+        """Scan the message once; handlers read the result from ``analysis``."""
+        self._analysis = detector.analyze(self.message)
+        return self
+
+    @property
+    def analysis(self) -> MessageAnalysis:
+        """Injection and privacy signals for the message."""
+        return self._analysis
+
 
 class ScoreResponse(BaseModel):
     """Response model for scoring endpoint."""
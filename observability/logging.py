@@ -1,11 +1,22 @@
 """Structured logging configuration."""
 
-import json
+import atexit
 import logging
+import queue
 import sys
-from datetime import datetime
+import time
+from logging.handlers import QueueHandler, QueueListener
 from typing import Any
 
+import orjson
+
+
+# Record attributes copied into the JSON output when present
+_EXTRA_FIELDS = ("correlation_id", "event", "data")
+
+# Level name -> number, e.g. "WARNING" -> 30
+_LEVELS = logging.getLevelNamesMapping()
+
 
 class JSONFormatter(logging.Formatter):
     """Format logs as JSON."""
@@ -13,37 +24,54 @@ class JSONFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON."""
         log_data = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": (
+                time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+                + f".{int(record.msecs):03d}Z"
+            ),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
         }
 
-        # Add extra fields
-        if hasattr(record, "correlation_id"):
-            log_data["correlation_id"] = record.correlation_id
-
-        if hasattr(record, "event"):
-            log_data["event"] = record.event
-
-        if hasattr(record, "data"):
-            log_data["data"] = record.data
+        # Add extra fields (set as record attributes via ``extra``)
+        fields = record.__dict__
+        for key in _EXTRA_FIELDS:
+            if key in fields:
+                log_data[key] = fields[key]
 
         # Add exception info if present
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
 
-        return json.dumps(log_data)
+        return orjson.dumps(log_data, default=str).decode()
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue records unformatted so formatting also happens on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Pass the record through as-is (the default pre-formats it here)."""
+        return record
 
 
 def setup_logging(level: str = "INFO") -> None:
-    """Configure structured logging."""
+    """Configure structured logging.
+
+    Callers only enqueue records; a background listener thread formats them
+    and writes to stdout, so log I/O never blocks the event loop.
+    """
     handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(JSONFormatter())
 
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    # Flush queued records on interpreter exit
+    atexit.register(listener.stop)
+
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
-    root_logger.addHandler(handler)
+    root_logger.addHandler(_DeferredQueueHandler(log_queue))
 
     # Reduce noise from libraries
     logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -52,13 +80,6 @@ def setup_logging(level: str = "INFO") -> None:
 
 def log_event(logger: logging.Logger, event: str, data: dict[str, Any], level: str = "INFO") -> None:
     """Log a structured event."""
-    extra = {"event": event, "data": data}
-
-    if level == "INFO":
-        logger.info(event, extra=extra)
-    elif level == "WARNING":
-        logger.warning(event, extra=extra)
-    elif level == "ERROR":
-        logger.error(event, extra=extra)
-    elif level == "DEBUG":
-        logger.debug(event, extra=extra)
+    levelno = _LEVELS.get(level, logging.INFO)
+    if logger.isEnabledFor(levelno):
+        logger.log(levelno, event, extra={"event": event, "data": data})
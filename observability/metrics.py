@@ -1,6 +1,17 @@
 """Prometheus metrics."""
 
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+import os
+from typing import Callable
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import REGISTRY, CounterMetricFamily
 
 # Request metrics
 scoring_requests_total = Counter(
@@ -12,7 +23,8 @@ scoring_requests_total = Counter(
 scoring_latency_seconds = Histogram(
     "scoring_latency_seconds",
     "Latency of scoring requests in seconds",
-    buckets=[0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0],
+    # Fine steps below 1s, where cache hits and fast-path rejections land
+    buckets=[0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0],
 )
 
 scoring_tokens_used = Histogram(
@@ -39,13 +51,66 @@ injection_attempts_total = Counter(
     "Total number of injection attempts detected",
 )
 
-# Cache metrics
-cache_hit_rate = Gauge(
-    "cache_hit_rate",
-    "Cache hit rate (0.0 to 1.0)",
+# Cache metrics (hit rate in PromQL:
+#   rate(scoring_cache_hits_total[1m])
+#     / (rate(scoring_cache_hits_total[1m]) + rate(scoring_cache_misses_total[1m])))
+scoring_cache_hits_total = Counter(
+    "scoring_cache_hits",
+    "Total number of scoring cache hits",
+)
+
+scoring_cache_misses_total = Counter(
+    "scoring_cache_misses",
+    "Total number of scoring cache misses",
+)
+
+llm_cache_hits_total = Counter(
+    "llm_cache_hits",
+    "Total number of LLM response cache hits",
+)
+
+llm_cache_misses_total = Counter(
+    "llm_cache_misses",
+    "Total number of LLM response cache misses",
 )
 
 
+class LRUCacheHitsCollector:
+    """Export hit counts of functools.lru_cache functions, read at scrape time.
+
+    Nothing is counted on the request path; the counts come from each
+    function's cache_info(). Values are per process and are not included in
+    the aggregated multiprocess output.
+    """
+
+    def __init__(self, name: str, documentation: str, caches: dict[str, Callable]):
+        """Export the hits of each cache under a "cache" label."""
+        self.name = name
+        self.documentation = documentation
+        self.caches = caches
+
+    def collect(self):
+        """Yield the current hit counts."""
+        hits = CounterMetricFamily(self.name, self.documentation, labels=["cache"])
+        for label, cached in self.caches.items():
+            hits.add_metric([label], cached.cache_info().hits)
+        yield hits
+
+
+def register_lru_cache_hits(name: str, documentation: str, caches: dict[str, Callable]) -> None:
+    """Register an LRUCacheHitsCollector with the default registry."""
+    REGISTRY.register(LRUCacheHitsCollector(name, documentation, caches))
+
+
 def get_metrics() -> tuple[str, str]:
-    """Get Prometheus metrics in text format."""
+    """Get Prometheus metrics in text format.
+
+    With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR (to an empty
+    directory, before the server starts) so each worker records metrics to
+    shared memory-mapped files and any worker can report the combined totals.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
     return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,6 +1,25 @@
 """Prompt injection detection."""
 
 import re
+from functools import lru_cache
+from typing import NamedTuple
+
+from security.validation import has_privacy_request
+
+# C0 and C1 control characters (except newline), deleted with str.translate
+_CONTROL_CHARS = dict.fromkeys(c for c in [*range(0x20), *range(0x7F, 0xA0)] if c != 0x0A)
+
+
+class MessageAnalysis(NamedTuple):
+    """Security signals for one message, from a single case-folded view."""
+
+    is_injection: bool
+    patterns: tuple[str, ...]
+    privacy_violation: bool
+
+
+# Number of recent messages whose analysis is memoized
+ANALYSIS_CACHE_SIZE = 4096
 
 
 class InjectionDetector:
@@ -31,7 +50,12 @@ class InjectionDetector:
 
     def __init__(self):
         """Initialize detector with compiled patterns."""
-        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.INJECTION_PATTERNS]
+        # Patterns are matched against case-folded text rather than compiled
+        # with re.IGNORECASE, which disables the fast literal-prefix search
+        self.patterns = [re.compile(pattern) for pattern in self.INJECTION_PATTERNS]
+        # Repeated messages (retries, bots, load tests) skip the scan entirely.
+        # The uncached implementation stays available as _analyze.
+        self.analyze = lru_cache(maxsize=ANALYSIS_CACHE_SIZE)(self._analyze)
 
     def detect(self, text: str) -> tuple[bool, list[str]]:
         """
@@ -40,10 +64,27 @@ class InjectionDetector:
         Returns:
             Tuple of (is_injection, matched_patterns)
         """
+        return self._match(text.casefold())
+
+    def _analyze(self, text: str) -> MessageAnalysis:
+        """
+        Run the injection patterns and the privacy screen over one case-folded copy of text.
+
+        Exposed (memoized) as ``analyze``.
+
+        Returns:
+            MessageAnalysis with is_injection, matched patterns and privacy_violation
+        """
+        folded = text.casefold()
+        is_injection, matched = self._match(folded)
+        return MessageAnalysis(is_injection, tuple(matched), has_privacy_request(folded))
+
+    def _match(self, folded: str) -> tuple[bool, list[str]]:
+        """Match the injection patterns against already case-folded text."""
         matched = []
 
         for pattern in self.patterns:
-            if pattern.search(text):
+            if pattern.search(folded):
                 matched.append(pattern.pattern)
 
         return len(matched) > 0, matched
@@ -57,8 +98,14 @@ class InjectionDetector:
         # Remove excessive whitespace
         text = " ".join(text.split())
 
-        # Remove control characters except newlines
-        text = "".join(char for char in text if char.isprintable() or char == "\n")
+        # Remove control characters except newlines. Most text is already
+        # printable; otherwise strip ASCII/C1 controls in C and fall back to a
+        # per-character pass only for other non-printables (e.g. zero-width
+        # or bidi formatting characters)
+        if not text.isprintable():
+            text = text.translate(_CONTROL_CHARS)
+            if not text.isprintable():
+                text = "".join(char for char in text if char.isprintable() or char == "\n")
 
         return text
 
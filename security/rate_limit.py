@@ -0,0 +1,129 @@
+"""Per-client rate limiting as ASGI middleware."""
+
+import logging
+import math
+import time
+from typing import Callable
+
+import orjson
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Namespace for rate-limit counters in a shared Redis
+REDIS_KEY_PREFIX = "ratelimit:"
+
+
+class TokenBucket:
+    """Token buckets keyed by client, refilled continuously at rate_per_minute.
+
+    Buckets idle for a full minute are refilled anyway, so they are kept in a
+    TTL cache and dropped after 60s instead of growing without bound. Each
+    check is a plain read-modify-write with no await in between, so no lock is
+    needed on the event loop.
+    """
+
+    def __init__(self, rate_per_minute: int, max_clients: int = 100_000):
+        """Initialize with a capacity of rate_per_minute requests."""
+        self.capacity = float(rate_per_minute)
+        self.refill_per_second = rate_per_minute / 60
+        self._buckets: TTLCache = TTLCache(maxsize=max_clients, ttl=60)
+
+    def acquire(self, key: str, now: float | None = None) -> float:
+        """
+        Take one token from key's bucket.
+
+        Returns:
+            0.0 if the request is allowed, otherwise seconds until a token is available
+        """
+        if now is None:
+            now = time.monotonic()
+        tokens, last = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - last) * self.refill_per_second)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / self.refill_per_second
+
+
+async def acquire_shared(redis, key: str, rate_per_minute: int, now: float | None = None) -> float:
+    """
+    Count one request against key's budget in Redis, shared by all workers.
+
+    Uses a fixed one-minute window: INCR on a per-window key, with EXPIRE so
+    old windows disappear.
+
+    Returns:
+        0.0 if the request is allowed, otherwise seconds until the window resets
+    """
+    if now is None:
+        now = time.time()
+    window = int(now // 60)
+    redis_key = f"{REDIS_KEY_PREFIX}{key}:{window}"
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.incr(redis_key)
+        pipe.expire(redis_key, 60)
+        count, _ = await pipe.execute()
+    if count <= rate_per_minute:
+        return 0.0
+    return (window + 1) * 60 - now
+
+
+class RateLimitMiddleware:
+    """Reject over-limit requests to the given paths with 429 before routing.
+
+    When get_redis returns a client, limits are counted in Redis and shared by
+    every worker. Otherwise (or if Redis fails) each process enforces its own
+    budget, so N workers allow up to N times rate_per_minute per client.
+    """
+
+    def __init__(
+        self,
+        app,
+        rate_per_minute: int,
+        paths: frozenset[str] = frozenset({"/score"}),
+        get_redis: Callable[[], object | None] = lambda: None,
+    ):
+        """Wrap an ASGI app."""
+        self.app = app
+        self.paths = paths
+        self.rate_per_minute = rate_per_minute
+        self.get_redis = get_redis
+        self.bucket = TokenBucket(rate_per_minute)
+        self._body = orjson.dumps({"error": f"Rate limit exceeded: {rate_per_minute} per 1 minute"})
+
+    async def __call__(self, scope, receive, send):
+        """Handle an ASGI connection."""
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        retry_after = await self._acquire(client[0] if client else "unknown")
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(self._body)).encode()),
+                    (b"retry-after", str(math.ceil(retry_after)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": self._body})
+
+    async def _acquire(self, key: str) -> float:
+        """Take one request from key's budget, in Redis when available."""
+        redis = self.get_redis()
+        if redis is not None:
+            try:
+                return await acquire_shared(redis, key, self.rate_per_minute)
+            except Exception as e:
+                logger.warning(f"Redis rate limit failed, using per-process limit: {e}")
+        return self.bucket.acquire(key)
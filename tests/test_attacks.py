@@ -54,3 +54,20 @@ def test_token_bombing():
     # Excessive repetition should be caught
     with pytest.raises(ValidationError):
         validate_message("test " * 100)
+
+
+def test_rate_limit_bucket():
+    """Test the token bucket caps request bursts per client."""
+    from security.rate_limit import TokenBucket
+
+    bucket = TokenBucket(rate_per_minute=3)
+
+    # Burst up to capacity, then reject
+    assert [bucket.acquire("1.2.3.4", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire("1.2.3.4", now=0.0) == 20.0
+
+    # Other clients have their own budget
+    assert bucket.acquire("5.6.7.8", now=0.0) == 0.0
+
+    # One token refills every 20s
+    assert bucket.acquire("1.2.3.4", now=20.0) == 0.0
@@ -0,0 +1,90 @@
+"""Tests for the scoring result cache."""
+
+import asyncio
+
+import pytest
+
+from agent.cache import ScoreCache
+
+
+@pytest.mark.asyncio
+async def test_single_flight():
+    """Test concurrent misses for one key share a single score() call."""
+    cache = ScoreCache()
+    calls = 0
+
+    async def score():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"score": 7}
+
+    results = await asyncio.gather(*(cache.get_or_score("key", score) for _ in range(5)))
+
+    assert calls == 1
+    assert [result for result, _ in results] == [{"score": 7}] * 5
+    assert sorted(hit for _, hit in results) == [False, True, True, True, True]
+
+
+@pytest.mark.asyncio
+async def test_failure_propagates_to_waiters():
+    """Test a scoring failure is raised in every coalesced request and not cached."""
+    cache = ScoreCache()
+
+    async def score():
+        await asyncio.sleep(0.01)
+        raise ValueError("LLM unavailable")
+
+    results = await asyncio.gather(
+        *(cache.get_or_score("key", score) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+
+    async def recovered():
+        return {"score": 3}
+
+    assert await cache.get_or_score("key", recovered) == ({"score": 3}, False)
+
+
+@pytest.mark.asyncio
+async def test_leader_cancellation():
+    """Test waiters score the message themselves when the first request is cancelled."""
+    cache = ScoreCache()
+    started = asyncio.Event()
+    calls = 0
+
+    async def score():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await asyncio.sleep(0.01)
+        return {"score": 5}
+
+    leader = asyncio.create_task(cache.get_or_score("key", score))
+    await started.wait()
+    waiters = [asyncio.create_task(cache.get_or_score("key", score)) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    results = await asyncio.gather(*waiters)
+    assert [result for result, _ in results] == [{"score": 5}] * 3
+    assert leader.cancelled()
+    # One new call replaces the cancelled one; the other waiters share it
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry():
+    """Test results are scored again once their TTL has passed."""
+    cache = ScoreCache(ttl=0.05)
+    calls = 0
+
+    async def score():
+        nonlocal calls
+        calls += 1
+        return {"score": calls}
+
+    assert await cache.get_or_score("key", score) == ({"score": 1}, False)
+    assert await cache.get_or_score("key", score) == ({"score": 1}, True)
+    await asyncio.sleep(0.1)
+    assert await cache.get_or_score("key", score) == ({"score": 2}, False)